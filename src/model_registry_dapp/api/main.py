@@ -1,13 +1,32 @@
+import asyncio
+
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .routes import router
 from ..config.settings import get_settings
+from ..core.blockchain import blockchain_client
 
 settings = get_settings()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # レジストリのスナップショットを定期的に保存
+    sync_task = None
+    if settings.SNAPSHOT_INTERVAL_SECONDS > 0 and blockchain_client.is_contract_initialized():
+        sync_task = asyncio.create_task(
+            blockchain_client.sync_snapshot_periodically(settings.SNAPSHOT_INTERVAL_SECONDS)
+        )
+    yield
+    if sync_task is not None:
+        sync_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await sync_task
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    lifespan=lifespan
 )
 
 # CORS設定
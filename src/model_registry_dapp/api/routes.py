@@ -1,19 +1,101 @@
+import hashlib
 import logging
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from .schemas import ModelCreate, ModelResponse, ValidationCreate, ValidationResponse
-from ..core.blockchain import blockchain_client
-from typing import List
+from ..core.blockchain import NodeUnavailableError, blockchain_client
+from ..core.snapshot import RegistrySnapshot
+from typing import Any, Awaitable, Callable, List, Optional
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+BLOCK_NUMBER_HEADER = "X-Block-Number"
+SNAPSHOT_STALE_HEADER = "X-Snapshot-Stale"
+SNAPSHOT_AGE_HEADER = "X-Snapshot-Age"
+
+def _make_etag(block_number: int, request: Request) -> str:
+    """ブロック番号とリクエストのパス・クエリからETagを生成"""
+    key = f"{block_number}:{request.url.path}?{request.url.query}"
+    return f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+def _etag_matches(etag: str, request: Request) -> bool:
+    """If-None-MatchヘッダーがETagと一致するかどうかを確認"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def _block_headers(block_number: int, etag: str, snapshot_age: Optional[float] = None) -> dict:
+    headers = {BLOCK_NUMBER_HEADER: str(block_number), "ETag": etag}
+    if snapshot_age is not None:
+        headers[SNAPSHOT_STALE_HEADER] = "true"
+        headers[SNAPSHOT_AGE_HEADER] = str(int(snapshot_age))
+    return headers
+
+def _resolve_snapshot_block(snapshot: Optional[RegistrySnapshot], at_block: Optional[int]) -> int:
+    """ノード停止時にスナップショットから応答できるブロック番号を取得"""
+    if snapshot is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Blockchain node unavailable and no snapshot is available"
+        )
+    if at_block is not None and at_block != snapshot.block_number:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Blockchain node unavailable. Only block {snapshot.block_number} is available from snapshot"
+        )
+    return snapshot.block_number
+
+async def _pinned_read(
+    request: Request,
+    at_block: Optional[int],
+    read_live: Callable[[int], Awaitable[Any]],
+    read_snapshot: Callable[[RegistrySnapshot], Any]
+) -> tuple[Any, dict]:
+    """単一のブロックに固定して読み取り、結果とレスポンスヘッダーを返す
+
+    If-None-Matchが一致する場合、結果はNoneになる。
+    ノードに接続できない場合は保存済みのスナップショットにフォールバックする。
+    """
+    try:
+        block_number = blockchain_client.resolve_block(at_block)
+    except NodeUnavailableError as e:
+        logger.warning(f"{e}. Serving from snapshot")
+        block_number = None
+    except ValueError as e:
+        # 最新ブロックより先のブロックが指定された
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if block_number is not None:
+        etag = _make_etag(block_number, request)
+        headers = _block_headers(block_number, etag)
+        if _etag_matches(etag, request):
+            return None, headers
+        try:
+            return await read_live(block_number), headers
+        except NodeUnavailableError as e:
+            # 読み取りの途中でノードが停止した
+            logger.warning(f"{e}. Serving from snapshot")
+
+    # 同期処理による差し替えでヘッダーと本文が食い違わないよう、スナップショットは一度だけ参照する
+    snapshot = blockchain_client.snapshot
+    block_number = _resolve_snapshot_block(snapshot, at_block)
+    etag = _make_etag(block_number, request)
+    headers = _block_headers(block_number, etag, snapshot_age=snapshot.age_seconds())
+    if _etag_matches(etag, request):
+        return None, headers
+    return read_snapshot(snapshot), headers
+
 @router.get("/status")
 async def get_contract_status():
     """スマートコントラクトとweb3の接続状況を確認"""
+    snapshot = blockchain_client.snapshot
     return {
         "contract_initialized": blockchain_client.is_contract_initialized(),
-        "web3_connected": blockchain_client.w3.is_connected()
+        "web3_connected": blockchain_client.w3.is_connected(),
+        "snapshot_block_number": snapshot.block_number if snapshot else None
     }
 
 @router.post("/models/", response_model=ModelResponse)
@@ -55,7 +137,12 @@ async def create_model(model: ModelCreate):
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/models/{model_id}", response_model=ModelResponse)
-async def get_model(model_id: str):
+async def get_model(
+    model_id: str,
+    request: Request,
+    response: Response,
+    at_block: Optional[int] = Query(None, ge=0)
+):
     """モデル情報を取得"""
     try:
         logger.debug(f"Received request for model_id: {model_id}")
@@ -66,9 +153,18 @@ async def get_model(model_id: str):
                 status_code=503,
                 detail="Smart contract not initialized. Please set CONTRACT_ADDRESS in environment variables."
             )
-    
-        model_info = await blockchain_client.get_model(model_id)
+
+        model_info, headers = await _pinned_read(
+            request,
+            at_block,
+            lambda block_number: blockchain_client.get_model(model_id, block_identifier=block_number),
+            lambda snapshot: snapshot.get_model(model_id)
+        )
+        if model_info is None:
+            return Response(status_code=304, headers=headers)
+
         logger.debug(f"Retrieved model info: {model_info}")
+        response.headers.update(headers)
 
         return ModelResponse(
             model_id=model_id,
@@ -80,6 +176,8 @@ async def get_model(model_id: str):
             is_active=model_info["is_active"]
         )
     
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.error(f"Value error in get_model: {e}")
         raise HTTPException(status_code=404, detail=str(e))
@@ -88,7 +186,11 @@ async def get_model(model_id: str):
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/models/", response_model=List[ModelResponse])
-async def get_models():
+async def get_models(
+    request: Request,
+    response: Response,
+    at_block: Optional[int] = Query(None, ge=0)
+):
     """すべての登録済みモデルを取得"""
     try:
         logging.info("Fetching all models")
@@ -99,9 +201,21 @@ async def get_models():
                 detail="Smart contract not initialized"
             )
         try:
-            models = await blockchain_client.get_all_models()
-            logger.info(f"Found {len(models)} models")
+            # すべての読み取りを単一のブロックに固定する
+            models, headers = await _pinned_read(
+                request,
+                at_block,
+                lambda block_number: blockchain_client.get_all_models(block_identifier=block_number),
+                lambda snapshot: snapshot.list_models()
+            )
+            if models is None:
+                return Response(status_code=304, headers=headers)
+
+            logger.info(f"Found {len(models)} models at block {headers[BLOCK_NUMBER_HEADER]}")
+            response.headers.update(headers)
             return models
+        except HTTPException:
+            raise
         except ValueError as e:
             logger.error(f"Value error: {e}")
             raise HTTPException(status_code=400, detail=str(e))
@@ -111,6 +225,8 @@ async def get_models():
                 status_code=500,
                 detail=f"Internal server error: {str(e)}"
             )
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
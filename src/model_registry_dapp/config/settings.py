@@ -7,6 +7,11 @@ class Settings(BaseSettings):
     CONTRACT_ADDRESS: str | None = None
     CHAIN_ID: int = 31337 # HardhatのデフォルトチェーンID
 
+    # スナップショット設定（ノード停止時の読み取り用）
+    SNAPSHOT_PATH: str = "registry_snapshot.json.gz"
+    SNAPSHOT_INTERVAL_SECONDS: int = 60 # 0以下で定期保存を無効化
+    SNAPSHOT_LOG_CHUNK_SIZE: int = 1000 # eth_getLogsで一度に取得するブロック数
+
     # API設定
     API_V1_PREFIX: str = "/api/v1"
     PROJECT_NAME: str = "Model Registry API"
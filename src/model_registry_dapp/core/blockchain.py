@@ -1,25 +1,35 @@
+import asyncio
 import json
 import logging
+import time
 
+from dataclasses import replace
 from web3 import Web3
 from web3.contract import Contract
+from web3.exceptions import ProviderConnectionError
 from eth_typing import Address
 from pathlib import Path
 from ..config.settings import get_settings
+from .snapshot import RegistrySnapshot, load_snapshot, normalize_model_id, save_snapshot
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+class NodeUnavailableError(ConnectionError):
+    """RPCノードに接続できない場合のエラー"""
+
 class BlockchainClient:
     def __init__(self):
         self.w3 = Web3(Web3.HTTPProvider(settings.WEB3_PROVIDER_URI))
         self.contract: Contract | None = None
+        self.snapshot: RegistrySnapshot | None = None
         try:
             self._load_contract()
         except Exception as e:
             logger.warning(f"Contract initialization failed: {e}")
             print(f"Warning: Contract initialization failed: {e}")
             print("Some functionality may be limited untill a contract address is provided.")
+        self._load_snapshot()
 
     def _load_contract(self) -> None:
         if not settings.CONTRACT_ADDRESS:
@@ -53,6 +63,16 @@ class BlockchainClient:
             logger.error(f"Error loading contract: {e}")
             raise
 
+    def _load_snapshot(self) -> None:
+        """ノード停止時に備えて保存済みのスナップショットを読み込む"""
+        snapshot = load_snapshot(settings.SNAPSHOT_PATH)
+        if snapshot is None or not self.contract:
+            return
+        if snapshot.contract_address != self.contract.address:
+            logger.warning("Ignoring snapshot taken for a different contract address")
+            return
+        self.snapshot = snapshot
+
     def _convert_initialized(self, hex_string: str) -> bytes:
         """16進数文字列をbytes32に変換"""
         # 0xプレフィックスを削除し、32バイトに調整
@@ -62,6 +82,18 @@ class BlockchainClient:
     def is_contract_initialized(self) -> bool:
         """コントラクトが初期化されているかどうかを確認"""
         return self.contract is not None
+
+    def resolve_block(self, at_block: int | None = None) -> int:
+        """読み取りを固定するブロック番号を決定（未指定の場合は最新ブロック）"""
+        try:
+            latest = self.w3.eth.block_number
+        except (OSError, ProviderConnectionError) as e:
+            raise NodeUnavailableError(f"Blockchain node unavailable: {e}") from e
+        if at_block is None:
+            return latest
+        if at_block > latest:
+            raise ValueError(f"Block {at_block} is ahead of the latest block {latest}")
+        return at_block
     
     async def get_model(self, model_id: str) -> dict:
         if not self.is_contract_initialized():
@@ -137,7 +169,65 @@ class BlockchainClient:
             logger.error(f"Error is register_model: {e}")
             raise
     
-    async def get_model(self, model_id: str) -> dict:
+    def _rpc(self, request, *args, **kwargs):
+        """ノードへのリクエストを実行する（接続エラーはNodeUnavailableErrorに変換）"""
+        try:
+            return request(*args, **kwargs)
+        except (OSError, ProviderConnectionError) as e:
+            raise NodeUnavailableError(f"Blockchain node unavailable: {e}") from e
+
+    def _call(self, function, block_identifier: int | str):
+        """コントラクトの読み取り関数を呼び出す"""
+        return self._rpc(function.call, block_identifier=block_identifier)
+
+    def _get_block_hash(self, block_number: int) -> str:
+        block = self._rpc(self.w3.eth.get_block, block_number)
+        return bytes(block["hash"]).hex()
+
+    def _is_on_current_chain(self, snapshot: RegistrySnapshot, latest: int) -> bool:
+        """スナップショットのブロックが現在のチェーン上にあるかどうかを確認"""
+        if snapshot.block_number > latest:
+            return False
+        return snapshot.block_hash == self._get_block_hash(snapshot.block_number)
+
+    def _read_model(self, model_id: bytes, block_identifier: int | str) -> dict:
+        model = self._call(self.contract.functions.getModel(model_id), block_identifier)
+        return {
+            "name": model[0],
+            "version": model[1],
+            "metadata_uri": model[2],
+            "owner": model[3],
+            "timestamp": model[4],
+            "is_active": model[5]
+        }
+
+    def _read_all_models(self, block_identifier: int, skip_errors: bool = True) -> list:
+        """指定ブロックでのすべてのモデルを読み取る
+
+        skip_errorsがFalseの場合、読み取りに失敗したモデルがあれば全体を失敗させる。
+        ノードへの接続エラーは常に送出する。
+        """
+        model_ids = self._call(self.contract.functions.getAllModelIds(), block_identifier)
+
+        models = []
+        for model_id in model_ids:
+            try:
+                models.append({
+                    "model_id": model_id.hex(),
+                    **self._read_model(model_id, block_identifier)
+                })
+            except NodeUnavailableError:
+                raise
+            except Exception as e:
+                if not skip_errors:
+                    raise
+                logger.error(f"Error getting model {model_id.hex()}: {e}")
+                continue
+
+        return models
+
+    async def get_model(self, model_id: str, block_identifier: int | None = None) -> dict:
+        """モデル情報を取得（ブロック番号を指定しない場合は最新ブロック）"""
         if not self.contract:
             raise ValueError("Contract not initialized")
         
@@ -146,52 +236,112 @@ class BlockchainClient:
             if model_id.startswith('0x'):
                 model_id = model_id[2:]
             model_id_bytes = bytes.fromhex(model_id.zfill(64))
-        
-            model = self.contract.functions.getModel(model_id_bytes).call()
 
-            return {
-                "name": model[0],
-                "version": model[1],
-                "metadata_uri": model[2],
-                "owner": model[3],
-                "timestamp": model[4],
-                "is_active": model[5]
-            }
+            return self._read_model(
+                model_id_bytes,
+                "latest" if block_identifier is None else block_identifier
+            )
         except Exception as e:
             logger.error(f"Error in get_model: {e}", exc_info=True)
             raise
 
-    async def get_all_models(self) -> list:
-        """すべての登録済みモデルを取得"""
+    async def get_all_models(self, block_identifier: int | None = None) -> list:
+        """すべての登録済みモデルを取得
+
+        複数回の呼び出しが同じ状態を読むよう、すべての呼び出しを単一のブロックに固定する。
+        """
         if not self.is_contract_initialized():
             raise ValueError("Contract not initialized")
         
         try:
-            logger.info("Getting all models from blockchain")
+            if block_identifier is None:
+                block_identifier = self.resolve_block()
+            logger.info(f"Getting all models from blockchain at block {block_identifier}")
             logger.info(f"Contract address: {self.contract.address}")
-            model_ids = self.contract.functions.getAllModelIds().call()
-
-            models = []
-            for model_id in model_ids:
-                try:
-                    model = self.contract.functions.getModel(model_id).call()
-                    models.append({
-                        "model_id": model_id.hex(),
-                        "name": model[0],
-                        "version": model[1],
-                        "metadata_uri": model[2],
-                        "owner": model[3],
-                        "timestamp": model[4],
-                        "is_active": model[5]
-                    })
-                except Exception as e:
-                    logger.error(f"Error getting model {model_id.hex()}: {e}")
-                    continue
-            
-            return models
+            return self._read_all_models(block_identifier)
 
         except Exception as e:
             logger.error(f"Error in get_all_models: {e}")
             raise
-    
-blockchain_client = BlockchainClient()
\ No newline at end of file
+
+    def _get_changed_model_ids(self, from_block: int, to_block: int) -> list:
+        """指定範囲のイベントから登録・更新されたモデルIDを発生順に取得
+
+        プロバイダーのブロック範囲の上限に収まるよう、一定のブロック数ごとにログを取得する。
+        """
+        chunk_size = max(1, settings.SNAPSHOT_LOG_CHUNK_SIZE)
+        logs = []
+        for chunk_start in range(from_block, to_block + 1, chunk_size):
+            chunk_end = min(chunk_start + chunk_size - 1, to_block)
+            for event in (self.contract.events.ModelRegistered, self.contract.events.ModelUpdated):
+                logs.extend(self._rpc(event().get_logs, from_block=chunk_start, to_block=chunk_end))
+        logs.sort(key=lambda log: (log['blockNumber'], log['logIndex']))
+        return list(dict.fromkeys(log['args']['modelId'] for log in logs))
+
+    async def sync_snapshot(self) -> RegistrySnapshot:
+        """スナップショットを最新ブロックまで更新して保存
+
+        web3の呼び出しはブロッキングのため、イベントループを止めないようワーカースレッドで実行する。
+        """
+        return await asyncio.to_thread(self._sync_snapshot)
+
+    def _sync_snapshot(self) -> RegistrySnapshot:
+        """既存のスナップショットがあれば、そのブロック以降のイベントで変更されたモデルのみを読み直す
+
+        読み取りに失敗した場合は例外を送出し、以前のスナップショットをそのまま残す。
+        """
+        if not self.is_contract_initialized():
+            raise ValueError("Contract not initialized")
+
+        latest = self.resolve_block()
+        snapshot = self.snapshot
+        if snapshot is not None and not self._is_on_current_chain(snapshot, latest):
+            # ノードの再起動やリオーグでスナップショットのブロックが現在のチェーンにない
+            logger.warning(f"Snapshot block {snapshot.block_number} is not on the current chain")
+            snapshot = None
+
+        if snapshot is not None and snapshot.block_number == latest:
+            # 変更はないが、最新であることを確認した時刻を更新する
+            snapshot = replace(snapshot, confirmed_at=time.time())
+        elif snapshot is None:
+            # 初回、またはチェーンが変わった場合は全件を読み直す
+            logger.info(f"Building full snapshot at block {latest}")
+            models = self._read_all_models(latest, skip_errors=False)
+            snapshot = RegistrySnapshot(
+                block_number=latest,
+                contract_address=self.contract.address,
+                block_hash=self._get_block_hash(latest),
+                models={normalize_model_id(model.pop("model_id")): model for model in models}
+            )
+        else:
+            changed_ids = self._get_changed_model_ids(snapshot.block_number + 1, latest)
+            logger.info(
+                f"Catching up snapshot from block {snapshot.block_number} to {latest}: "
+                f"{len(changed_ids)} changed models"
+            )
+            models = dict(snapshot.models)
+            for model_id in changed_ids:
+                models[normalize_model_id(model_id.hex())] = self._read_model(model_id, latest)
+            snapshot = RegistrySnapshot(
+                block_number=latest,
+                contract_address=self.contract.address,
+                block_hash=self._get_block_hash(latest),
+                models=models
+            )
+
+        save_snapshot(snapshot, settings.SNAPSHOT_PATH)
+        self.snapshot = snapshot
+        return snapshot
+
+    async def sync_snapshot_periodically(self, interval: float) -> None:
+        """一定間隔でスナップショットを更新（ノード停止中はスキップし、復旧後に差分を取り込む）"""
+        while True:
+            try:
+                await self.sync_snapshot()
+            except NodeUnavailableError as e:
+                logger.warning(f"Skipping snapshot sync: {e}")
+            except Exception as e:
+                logger.error(f"Error in sync_snapshot: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+blockchain_client = BlockchainClient()
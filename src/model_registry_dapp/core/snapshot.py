@@ -0,0 +1,97 @@
+import gzip
+import json
+import logging
+import os
+import time
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+# モデルはこの順序の配列として保存する（キー名の繰り返しを避けるため）
+MODEL_FIELDS = ("name", "version", "metadata_uri", "owner", "timestamp", "is_active")
+
+def normalize_model_id(model_id: str) -> str:
+    """モデルIDを0xなし・64桁の小文字16進数文字列に正規化"""
+    if model_id.startswith('0x'):
+        model_id = model_id[2:]
+    return model_id.lower().zfill(64)
+
+@dataclass
+class RegistrySnapshot:
+    """特定のブロック時点でのレジストリ全体のスナップショット"""
+    block_number: int
+    contract_address: str
+    # block_numberのブロックハッシュ（チェーンのリセットやリオーグの検出に使う）
+    block_hash: str | None = None
+    # モデル情報を最後に書き込んだ時刻
+    saved_at: float = field(default_factory=time.time)
+    # ノードの最新ブロックと一致することを最後に確認した時刻
+    confirmed_at: float = field(default_factory=time.time)
+    # model_id -> モデル情報（登録順を保持）
+    models: dict[str, dict] = field(default_factory=dict)
+
+    def age_seconds(self) -> float:
+        """最新であることを最後に確認してからの経過秒数"""
+        return max(0.0, time.time() - self.confirmed_at)
+
+    def list_models(self) -> list:
+        return [{"model_id": model_id, **model} for model_id, model in self.models.items()]
+
+    def get_model(self, model_id: str) -> dict:
+        model = self.models.get(normalize_model_id(model_id))
+        if model is None:
+            raise ValueError("Model does not exist in snapshot")
+        return dict(model)
+
+def save_snapshot(snapshot: RegistrySnapshot, path: str | Path) -> None:
+    """スナップショットをgzip圧縮したJSONとしてアトミックに保存"""
+    path = Path(path)
+    payload = {
+        "v": SNAPSHOT_FORMAT_VERSION,
+        "block": snapshot.block_number,
+        "block_hash": snapshot.block_hash,
+        "contract": snapshot.contract_address,
+        "saved_at": snapshot.saved_at,
+        "confirmed_at": snapshot.confirmed_at,
+        "models": [
+            [model_id, *(model[name] for name in MODEL_FIELDS)]
+            for model_id, model in snapshot.models.items()
+        ],
+    }
+    tmp_path = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(payload, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    logger.info(f"Saved snapshot of {len(snapshot.models)} models at block {snapshot.block_number}")
+
+def load_snapshot(path: str | Path) -> RegistrySnapshot | None:
+    """保存済みのスナップショットを読み込む（存在しない・壊れている場合はNone）"""
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("v") != SNAPSHOT_FORMAT_VERSION:
+            logger.warning(f"Ignoring snapshot with unsupported format version: {payload.get('v')}")
+            return None
+
+        models = {row[0]: dict(zip(MODEL_FIELDS, row[1:])) for row in payload["models"]}
+        snapshot = RegistrySnapshot(
+            block_number=payload["block"],
+            block_hash=payload["block_hash"],
+            contract_address=payload["contract"],
+            saved_at=payload["saved_at"],
+            confirmed_at=payload["confirmed_at"],
+            models=models
+        )
+        logger.info(f"Loaded snapshot of {len(models)} models at block {snapshot.block_number}")
+        return snapshot
+    except Exception as e:
+        logger.warning(f"Failed to load snapshot from {path}: {e}")
+        return None
@@ -1,13 +1,17 @@
 import pytest
 from fastapi.testclient import TestClient
+from unittest.mock import PropertyMock
 from model_registry_dapp.api.schemas import ModelCreate
+from model_registry_dapp.core.blockchain import NodeUnavailableError
+from model_registry_dapp.core.snapshot import RegistrySnapshot
 
 def test_get_contract_status(client, mock_blockchain_client):
     response = client.get("/api/v1/status")
     assert response.status_code == 200
     assert response.json() == {
         "contract_initialized": True,
-        "web3_connected": True
+        "web3_connected": True,
+        "snapshot_block_number": None
     }
 
 def test_create_model_success(client, mock_blockchain_client):
@@ -76,3 +80,148 @@ def test_contract_not_initialized(client, mock_blockchain_client):
 
     assert response.status_code == 503
     assert "Smart contract not initialized" in response.json()["detail"]
+
+def test_get_models_pinned_to_latest_block(client, mock_blockchain_client):
+    response = client.get("/api/v1/models/")
+
+    assert response.status_code == 200
+    assert response.headers["X-Block-Number"] == "100"
+    assert "ETag" in response.headers
+    assert response.json()[0]["name"] == "TestModel"
+
+def test_get_models_at_block(client, mock_blockchain_client):
+    response = client.get("/api/v1/models/", params={"at_block": 42})
+
+    assert response.status_code == 200
+    assert response.headers["X-Block-Number"] == "42"
+
+def test_get_models_not_modified(client, mock_blockchain_client):
+    etag = client.get("/api/v1/models/").headers["ETag"]
+
+    response = client.get("/api/v1/models/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["X-Block-Number"] == "100"
+
+    # ブロックが異なればETagも変わる
+    response = client.get(
+        "/api/v1/models/",
+        params={"at_block": 42},
+        headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+
+def test_get_model_not_modified(client, mock_blockchain_client):
+    model_id = "0x1234567890123456789012345678901234567890123456789012345678901234"
+    etag = client.get(f"/api/v1/models/{model_id}").headers["ETag"]
+
+    response = client.get(f"/api/v1/models/{model_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+@pytest.fixture
+def node_unavailable(mock_blockchain_client):
+    # ノード停止状態をモック
+    def mock_resolve_block_error(at_block=None):
+        raise NodeUnavailableError("Blockchain node unavailable")
+
+    mock_blockchain_client.resolve_block = mock_resolve_block_error
+    return mock_blockchain_client
+
+def test_get_models_from_snapshot(client, node_unavailable):
+    model_id = "1234567890123456789012345678901234567890123456789012345678901234"
+    node_unavailable.snapshot = RegistrySnapshot(
+        block_number=90,
+        contract_address="0x1234567890123456789012345678901234567890",
+        models={model_id: {
+            "name": "SnapshotModel",
+            "version": "1.0.0",
+            "metadata_uri": "ipfs://snapshot",
+            "owner": "0x1234567890123456789012345678901234567890",
+            "timestamp": 1637000000,
+            "is_active": True
+        }}
+    )
+
+    response = client.get("/api/v1/models/")
+    assert response.status_code == 200
+    assert response.headers["X-Block-Number"] == "90"
+    assert response.headers["X-Snapshot-Stale"] == "true"
+    assert response.json()[0]["name"] == "SnapshotModel"
+
+    response = client.get(f"/api/v1/models/0x{model_id}")
+    assert response.status_code == 200
+    assert response.json()["name"] == "SnapshotModel"
+
+    # スナップショット以外のブロックは読み取れない
+    response = client.get("/api/v1/models/", params={"at_block": 42})
+    assert response.status_code == 503
+
+def test_get_models_node_drops_during_read(client, mock_blockchain_client):
+    # ブロック番号の取得後にノードが停止した場合もスナップショットから応答する
+    async def mock_get_all_models_error(*args, **kwargs):
+        raise NodeUnavailableError("Blockchain node unavailable")
+
+    mock_blockchain_client.get_all_models = mock_get_all_models_error
+    mock_blockchain_client.get_model = mock_get_all_models_error
+    mock_blockchain_client.snapshot = RegistrySnapshot(
+        block_number=90,
+        contract_address="0x1234567890123456789012345678901234567890",
+        models={"ab".zfill(64): {
+            "name": "SnapshotModel",
+            "version": "1.0.0",
+            "metadata_uri": "ipfs://snapshot",
+            "owner": "0x1234567890123456789012345678901234567890",
+            "timestamp": 1637000000,
+            "is_active": True
+        }}
+    )
+
+    response = client.get("/api/v1/models/")
+    assert response.status_code == 200
+    assert response.headers["X-Block-Number"] == "90"
+    assert response.headers["X-Snapshot-Stale"] == "true"
+
+    response = client.get("/api/v1/models/0xab")
+    assert response.status_code == 200
+    assert response.json()["name"] == "SnapshotModel"
+
+def test_get_models_node_unavailable_without_snapshot(client, node_unavailable):
+    response = client.get("/api/v1/models/")
+    assert response.status_code == 503
+    assert "no snapshot" in response.json()["detail"]
+
+def test_at_block_ahead_of_chain_head(client, mock_blockchain_client):
+    def mock_resolve_block_ahead(at_block=None):
+        raise ValueError(f"Block {at_block} is ahead of the latest block 100")
+
+    mock_blockchain_client.resolve_block = mock_resolve_block_ahead
+
+    model_id = "0x1234567890123456789012345678901234567890123456789012345678901234"
+    assert client.get("/api/v1/models/", params={"at_block": 200}).status_code == 400
+    assert client.get(f"/api/v1/models/{model_id}", params={"at_block": 200}).status_code == 400
+
+def test_snapshot_replaced_during_request(client, node_unavailable):
+    def snapshot_at(block_number, name):
+        return RegistrySnapshot(
+            block_number=block_number,
+            contract_address="0x1234567890123456789012345678901234567890",
+            models={"ab".zfill(64): {
+                "name": name,
+                "version": "1.0.0",
+                "metadata_uri": "ipfs://snapshot",
+                "owner": "0x1234567890123456789012345678901234567890",
+                "timestamp": 1637000000,
+                "is_active": True
+            }}
+        )
+
+    # 参照するたびに同期処理でスナップショットが差し替えられる状況をモック
+    type(node_unavailable).snapshot = PropertyMock(side_effect=[
+        snapshot_at(90, "ModelAt90"),
+        snapshot_at(91, "ModelAt91"),
+        snapshot_at(92, "ModelAt92"),
+    ])
+
+    response = client.get("/api/v1/models/")
+    assert response.status_code == 200
+    assert response.headers["X-Block-Number"] == "90"
+    assert response.json()[0]["name"] == "ModelAt90"
@@ -22,6 +22,9 @@ def mock_blockchain_client(monkeypatch):
     # コントラクト初期化状態のモック
     mock_client.is_contract_initialized.return_value = True
 
+    # スナップショットは未保存の状態
+    mock_client.snapshot = None
+
     async def mock_get_model(*args, **kwargs):
         return {
             "name": "TestModel",
@@ -34,6 +37,20 @@ def mock_blockchain_client(monkeypatch):
     
     mock_client.get_model = mock_get_model
 
+    # 最新ブロック番号のモック
+    def mock_resolve_block(at_block=None):
+        return 100 if at_block is None else at_block
+
+    mock_client.resolve_block = mock_resolve_block
+
+    async def mock_get_all_models(*args, **kwargs):
+        return [{
+            "model_id": "1234567890123456789012345678901234567890123456789012345678901234",
+            **(await mock_get_model())
+        }]
+
+    mock_client.get_all_models = mock_get_all_models
+
     async def mock_register_model(*args, **kwargs):
         return {
             "model_id": "0x1234567890123456789012345678901234567890123456789012345678901234",
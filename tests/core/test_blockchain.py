@@ -0,0 +1,237 @@
+import asyncio
+import pytest
+
+from types import SimpleNamespace
+from unittest.mock import Mock
+from model_registry_dapp.core import blockchain as blockchain_module
+from model_registry_dapp.core.blockchain import BlockchainClient, NodeUnavailableError
+from model_registry_dapp.core.snapshot import RegistrySnapshot, load_snapshot, save_snapshot
+
+CONTRACT_ADDRESS = "0x1234567890123456789012345678901234567890"
+
+def model_id(suffix: str) -> bytes:
+    return bytes.fromhex(suffix.zfill(64))
+
+def model_tuple(name: str, version: str = "1.0.0") -> tuple:
+    return (name, version, f"ipfs://{name}", CONTRACT_ADDRESS, 1637000000, True)
+
+class FakeContract:
+    """呼び出し時のblock_identifierを記録するコントラクトのモック"""
+
+    def __init__(self, models: dict):
+        self.address = CONTRACT_ADDRESS
+        self.models = models
+        self.calls = []
+        # model_id -> 次のgetModel呼び出しで一度だけ送出する例外
+        self.failures = {}
+        self.logs = {"ModelRegistered": [], "ModelUpdated": []}
+        # get_logsで要求されたブロック範囲
+        self.log_ranges = []
+        self.log_failure = None
+        self.functions = SimpleNamespace(
+            getAllModelIds=lambda: self._bind(lambda: list(self.models)),
+            getModel=lambda model_id: self._bind(lambda: self._get_model(model_id))
+        )
+        self.events = SimpleNamespace(
+            ModelRegistered=lambda: self._event("ModelRegistered"),
+            ModelUpdated=lambda: self._event("ModelUpdated")
+        )
+
+    def _bind(self, read):
+        def call(block_identifier="latest"):
+            self.calls.append(block_identifier)
+            return read()
+        return SimpleNamespace(call=call)
+
+    def _get_model(self, model_id: bytes) -> tuple:
+        if model_id in self.failures:
+            raise self.failures.pop(model_id)
+        return self.models[model_id]
+
+    def _event(self, name: str):
+        def get_logs(from_block, to_block):
+            if self.log_failure is not None:
+                raise self.log_failure
+            self.log_ranges.append((name, from_block, to_block))
+            return [log for log in self.logs[name] if from_block <= log["blockNumber"] <= to_block]
+        return SimpleNamespace(get_logs=get_logs)
+
+    def emit(self, name: str, model_id: bytes, block_number: int, log_index: int) -> None:
+        self.logs[name].append({
+            "blockNumber": block_number,
+            "logIndex": log_index,
+            "args": {"modelId": model_id}
+        })
+
+def chain_blocks(chain: bytes):
+    """チェーンごとに異なるブロックハッシュを返すget_blockのモック"""
+    return lambda block_number: {"hash": chain + block_number.to_bytes(31, "big")}
+
+@pytest.fixture
+def contract():
+    return FakeContract({
+        model_id("aa"): model_tuple("ModelA"),
+        model_id("bb"): model_tuple("ModelB"),
+    })
+
+@pytest.fixture(autouse=True)
+def snapshot_path(tmp_path, monkeypatch):
+    path = tmp_path / "snapshot.json.gz"
+    monkeypatch.setattr(blockchain_module.settings, "SNAPSHOT_PATH", str(path))
+    return path
+
+@pytest.fixture
+def blockchain(contract):
+    client = BlockchainClient()
+    client.contract = contract
+    client.w3 = Mock()
+    client.w3.eth.block_number = 10
+    client.w3.eth.get_block.side_effect = chain_blocks(b"a")
+    return client
+
+def test_get_all_models_pinned_to_single_block(blockchain, contract):
+    models = asyncio.run(blockchain.get_all_models())
+
+    assert [model["name"] for model in models] == ["ModelA", "ModelB"]
+    # getAllModelIdsとすべてのgetModelが同じブロックを読む
+    assert contract.calls == [10, 10, 10]
+
+def test_get_all_models_at_block(blockchain, contract):
+    asyncio.run(blockchain.get_all_models(block_identifier=7))
+    assert contract.calls == [7, 7, 7]
+
+def test_get_model_at_block(blockchain, contract):
+    model = asyncio.run(blockchain.get_model("0xaa", block_identifier=7))
+
+    assert model["name"] == "ModelA"
+    assert contract.calls == [7]
+
+def test_resolve_block_ahead_of_chain_head(blockchain):
+    assert blockchain.resolve_block(5) == 5
+    with pytest.raises(ValueError):
+        blockchain.resolve_block(11)
+
+def test_get_all_models_node_unavailable(blockchain, contract):
+    # 接続エラーはスキップせずNodeUnavailableErrorとして送出する
+    contract.failures[model_id("bb")] = ConnectionError("connection refused")
+    with pytest.raises(NodeUnavailableError):
+        asyncio.run(blockchain.get_all_models())
+
+def test_sync_snapshot_full_build(blockchain, contract, snapshot_path):
+    snapshot = asyncio.run(blockchain.sync_snapshot())
+
+    assert snapshot.block_number == 10
+    assert list(snapshot.models) == ["aa".zfill(64), "bb".zfill(64)]
+    assert blockchain.snapshot is snapshot
+    assert load_snapshot(snapshot_path) == snapshot
+
+def test_sync_snapshot_full_build_fails_as_a_whole(blockchain, contract, snapshot_path):
+    previous = RegistrySnapshot(block_number=20, contract_address=CONTRACT_ADDRESS)
+    blockchain.snapshot = previous
+    contract.failures[model_id("bb")] = ValueError("execution reverted")
+
+    # 一部のモデルの読み取りに失敗した場合は以前のスナップショットを残す
+    with pytest.raises(ValueError):
+        asyncio.run(blockchain.sync_snapshot())
+    assert blockchain.snapshot is previous
+    assert not snapshot_path.exists()
+
+def test_sync_snapshot_catches_up_from_events(blockchain, contract):
+    asyncio.run(blockchain.sync_snapshot())
+
+    contract.models[model_id("aa")] = model_tuple("ModelA", "2.0.0")
+    contract.models[model_id("dd")] = model_tuple("ModelD")
+    contract.models[model_id("cc")] = model_tuple("ModelC")
+    contract.emit("ModelRegistered", model_id("dd"), block_number=11, log_index=0)
+    contract.emit("ModelRegistered", model_id("cc"), block_number=12, log_index=1)
+    contract.emit("ModelUpdated", model_id("aa"), block_number=12, log_index=0)
+    contract.emit("ModelUpdated", model_id("aa"), block_number=13, log_index=0)
+    # スナップショット以前のイベントは無視される
+    contract.emit("ModelUpdated", model_id("bb"), block_number=10, log_index=0)
+    blockchain.w3.eth.block_number = 13
+    contract.calls.clear()
+
+    snapshot = asyncio.run(blockchain.sync_snapshot())
+
+    assert snapshot.block_number == 13
+    assert list(snapshot.models) == [
+        "aa".zfill(64), "bb".zfill(64), "dd".zfill(64), "cc".zfill(64)
+    ]
+    assert snapshot.get_model("0xaa")["version"] == "2.0.0"
+    # 変更されたモデルのみを、重複なく最新ブロックで読み直す
+    assert contract.calls == [13, 13, 13]
+
+def test_sync_snapshot_fetches_logs_in_chunks(blockchain, contract, monkeypatch):
+    monkeypatch.setattr(blockchain_module.settings, "SNAPSHOT_LOG_CHUNK_SIZE", 2)
+    asyncio.run(blockchain.sync_snapshot())
+
+    contract.models[model_id("cc")] = model_tuple("ModelC")
+    contract.emit("ModelRegistered", model_id("cc"), block_number=15, log_index=0)
+    blockchain.w3.eth.block_number = 15
+
+    snapshot = asyncio.run(blockchain.sync_snapshot())
+
+    assert "cc".zfill(64) in snapshot.models
+    ranges = [(start, end) for name, start, end in contract.log_ranges if name == "ModelRegistered"]
+    assert ranges == [(11, 12), (13, 14), (15, 15)]
+
+def test_sync_snapshot_node_drops_while_fetching_logs(blockchain, contract):
+    previous = asyncio.run(blockchain.sync_snapshot())
+    blockchain.w3.eth.block_number = 12
+    contract.log_failure = ConnectionError("connection refused")
+
+    with pytest.raises(NodeUnavailableError):
+        asyncio.run(blockchain.sync_snapshot())
+    assert blockchain.snapshot is previous
+
+def test_sync_snapshot_rebuilds_after_chain_reset(blockchain, contract):
+    blockchain.snapshot = RegistrySnapshot(
+        block_number=50,
+        contract_address=CONTRACT_ADDRESS,
+        models={"ff".zfill(64): dict(blockchain._read_model(model_id("aa"), 50))}
+    )
+
+    snapshot = asyncio.run(blockchain.sync_snapshot())
+
+    assert snapshot.block_number == 10
+    assert list(snapshot.models) == ["aa".zfill(64), "bb".zfill(64)]
+
+def test_sync_snapshot_rebuilds_after_node_restart(blockchain, contract):
+    contract.models = {model_id("aa"): model_tuple("OldChainModel")}
+    blockchain.w3.eth.block_number = 5
+    asyncio.run(blockchain.sync_snapshot())
+
+    # ノードを再起動して同じアドレスに再デプロイし、以前の高さを超えた
+    contract.models = {model_id("bb"): model_tuple("NewChainModel")}
+    contract.emit("ModelRegistered", model_id("bb"), block_number=3, log_index=0)
+    blockchain.w3.eth.get_block.side_effect = chain_blocks(b"b")
+    blockchain.w3.eth.block_number = 8
+
+    snapshot = asyncio.run(blockchain.sync_snapshot())
+
+    assert snapshot.block_number == 8
+    assert [model["name"] for model in snapshot.list_models()] == ["NewChainModel"]
+
+def test_sync_snapshot_confirms_unchanged_snapshot(blockchain, contract, snapshot_path):
+    previous = asyncio.run(blockchain.sync_snapshot())
+    previous.confirmed_at -= 3600
+    previous.saved_at -= 3600
+
+    snapshot = asyncio.run(blockchain.sync_snapshot())
+
+    assert snapshot.saved_at == previous.saved_at
+    assert snapshot.age_seconds() < 60
+    assert load_snapshot(snapshot_path).confirmed_at == snapshot.confirmed_at
+
+def test_load_snapshot_checks_contract_address(blockchain, snapshot_path):
+    save_snapshot(
+        RegistrySnapshot(block_number=5, contract_address="0x" + "0" * 40),
+        snapshot_path
+    )
+    blockchain.snapshot = None
+    blockchain._load_snapshot()
+    assert blockchain.snapshot is None
+
+    save_snapshot(RegistrySnapshot(block_number=5, contract_address=CONTRACT_ADDRESS), snapshot_path)
+    blockchain._load_snapshot()
+    assert blockchain.snapshot.block_number == 5
@@ -0,0 +1,31 @@
+from model_registry_dapp.core.snapshot import RegistrySnapshot, load_snapshot, save_snapshot
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / "snapshot.json.gz"
+    snapshot = RegistrySnapshot(
+        block_number=10,
+        contract_address="0x1234567890123456789012345678901234567890",
+        block_hash="ab" * 32,
+        models={
+            "ab".zfill(64): {
+                "name": "TestModel",
+                "version": "1.0.0",
+                "metadata_uri": "ipfs://test",
+                "owner": "0x1234567890123456789012345678901234567890",
+                "timestamp": 1637000000,
+                "is_active": True
+            }
+        }
+    )
+    save_snapshot(snapshot, path)
+
+    loaded = load_snapshot(path)
+    assert loaded == snapshot
+    assert loaded.get_model("0xAB")["name"] == "TestModel"
+
+def test_load_missing_or_corrupt_snapshot(tmp_path):
+    path = tmp_path / "snapshot.json.gz"
+    assert load_snapshot(path) is None
+
+    path.write_bytes(b"not a snapshot")
+    assert load_snapshot(path) is None